@@ -2,17 +2,175 @@
 Main application for Middle Mile Support for Amazon Payment and Dispute Automation
 """
 import os
-from flask import Flask, request, jsonify, render_template, send_file
+import shutil
+import time
+import zipfile
+from contextlib import contextmanager
+from flask import Flask, Response, g, has_request_context, request, jsonify, render_template, send_file
 from services.sop_parser import SopParser
 from services.payment_calculator import PaymentCalculator
 from services.dispute_analyzer import DisputeAnalyzer
 from services.report_analyzer import ReportAnalyzer
 from services.cross_checker import CrossChecker
-from models.ml_model import MLModel
-import tempfile
+from services.result_cache import CrossCheckCache
+from services.sop_batch import SopBatchParser
+from services.parse_cache import DocumentResultCache, module_version
+from services.job_queue import Job, JobQueue, JobQueueFullError
+from services.zip_stream import stream_zip
+from services.metrics import MetricsRegistry
+from services import result_view
+from services.uploads import create_workspace, save_upload, upload_workspace
+from werkzeug.utils import secure_filename
+from models.model_pool import ModelPool
 
 app = Flask(__name__)
 
+# Requests with a larger body are rejected with 413 before any file is read
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 512)) * 1024 * 1024
+
+# Metrics scraped from /metrics; every worker writes its values to METRICS_DIR, so a
+# scrape answered by any worker adds up the whole server
+metrics = MetricsRegistry(
+    snapshot_dir=os.environ.get('METRICS_DIR', os.path.join('data', 'metrics')),
+    flush_interval=float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+)
+REQUEST_LATENCY = metrics.histogram('middle_mile_request_duration_seconds', 'Request latency by endpoint')
+REQUESTS = metrics.counter('middle_mile_requests_total', 'Requests by endpoint and status code')
+UPLOAD_BYTES = metrics.counter('middle_mile_upload_bytes_total', 'Request body bytes received by endpoint')
+STAGE_LATENCY = metrics.histogram('middle_mile_stage_duration_seconds', 'Latency of pipeline stages')
+ROWS_PROCESSED = metrics.counter('middle_mile_rows_processed_total', 'Settlement rows processed by stage')
+CACHE_LOOKUPS = metrics.counter('middle_mile_cache_lookups_total', 'Cache lookups by cache and result')
+
+@contextmanager
+def _stage(name):
+    """Time a pipeline stage, adding it to the request's profile when profiling is on"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=name)
+        profile = g.get('profile') if has_request_context() else None
+        if profile is not None:
+            profile.append({'stage': name, 'seconds': round(elapsed, 6)})
+
+def _record_cache_lookup(cache, hit):
+    """Count a hit or miss for one of the caches"""
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+@app.before_request
+def _start_request_timer():
+    """Start timing the request and turn on profiling if ?profile=1 was passed"""
+    g.request_start = time.perf_counter()
+    if request.args.get('profile') == '1':
+        g.profile = []
+
+@app.after_request
+def _record_request_metrics(response):
+    """Record request latency, status and upload size; expose the profile as Server-Timing"""
+    endpoint = request.endpoint or 'unknown'
+    REQUEST_LATENCY.observe(time.perf_counter() - g.get('request_start', time.perf_counter()), endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    if request.content_length:
+        UPLOAD_BYTES.inc(request.content_length, endpoint=endpoint)
+    
+    profile = g.get('profile')
+    if profile:
+        response.headers['Server-Timing'] = ', '.join(
+            f"{entry['stage']};dur={entry['seconds'] * 1000:.1f}" for entry in profile
+        )
+    return response
+
+# Cross-check results are reused across report endpoints for identical uploads, and
+# shared with the other worker processes through CROSS_CHECK_CACHE_DIR
+cross_check_cache = CrossCheckCache(
+    max_entries=int(os.environ.get('CROSS_CHECK_CACHE_SIZE', 32)),
+    ttl_seconds=int(os.environ.get('CROSS_CHECK_CACHE_TTL', 3600)),
+    cache_dir=os.environ.get('CROSS_CHECK_CACHE_DIR', os.path.join('data', 'cross_check_cache')),
+    max_bytes=int(os.environ.get('CROSS_CHECK_CACHE_MB', 512)) * 1024 * 1024,
+    max_disk_bytes=int(os.environ.get('CROSS_CHECK_CACHE_DISK_MB', 4096)) * 1024 * 1024
+)
+
+# Page sizes for the per-tour lists of /cross_check results
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# report_type -> (CrossChecker method, file prefix, error message)
+REPORT_TYPES = {
+    'tour_analysis': ('generate_excel_report', 'tour_analysis_report', 'Failed to generate Excel report'),
+    'payment': ('generate_payment_report', 'payment_report', 'Failed to generate payment report'),
+    'dispute': ('generate_dispute_report', 'dispute_report', 'Failed to generate dispute report'),
+}
+
+# Files written by CrossChecker.generate_payment_and_dispute_reports, bundled into one zip
+PAYMENT_AND_DISPUTE_FILES = ('payment_report.xlsx', 'dispute_report.xlsx')
+
+# Background jobs: cross-checking alone, one report, or the payment/dispute bundle
+JOB_TYPES = ('cross_check', 'payment_and_dispute') + tuple(REPORT_TYPES)
+
+# ML models are loaded once per worker process and reused across requests
+ml_model_pool = ModelPool(size=int(os.environ.get('ML_MODEL_POOL_SIZE', 1)))
+
+# Extracted SOP factors are cached on disk; entries written by an older SopParser stop matching
+sop_parse_cache = DocumentResultCache(
+    os.environ.get('SOP_PARSE_CACHE_DIR', os.path.join('data', 'sop_parse_cache')),
+    version=module_version('services.sop_parser'),
+    max_entries=int(os.environ.get('SOP_PARSE_CACHE_SIZE', 512))
+)
+
+# Rate card analytics are materialized once per rate card in their own cache directory;
+# entries written by an older ReportAnalyzer stop matching
+rate_card_analysis_cache = DocumentResultCache(
+    os.environ.get('RATE_CARD_CACHE_DIR', os.path.join('data', 'rate_card_analysis')),
+    version=module_version('services.report_analyzer'),
+    max_entries=int(os.environ.get('RATE_CARD_CACHE_SIZE', 256))
+)
+
+# SOP parsing is CPU-bound pure Python, so batches are parsed in worker processes.
+# Every web worker has its own pool, so by default they split the cores between them
+SOP_PARSE_WORKERS = int(os.environ.get(
+    'SOP_PARSE_WORKERS', max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)))
+))
+sop_batch_parser = SopBatchParser(max_workers=SOP_PARSE_WORKERS)
+
+def _parse_sop_upload(file):
+    """Parse an uploaded SOP, saving it to disk only when it is not already cached"""
+    # Cached documents are recognized straight from the request stream
+    key = sop_parse_cache.key_for_stream(file.stream, file.filename)
+    sop_data = sop_parse_cache.get(key)
+    if sop_data is not None:
+        return sop_data, True
+    
+    with upload_workspace() as upload_dir:
+        with _stage('upload_save'):
+            filepath = save_upload(file, upload_dir)
+        parser = SopParser()
+        sop_data = parser.parse(filepath)
+    
+    sop_parse_cache.put(key, sop_data)
+    return sop_data, False
+
+def _with_profile(payload):
+    """Attach the per-stage breakdown to a JSON payload when profiling is on"""
+    profile = g.get('profile')
+    if profile is not None:
+        payload['profile'] = {
+            'stages': profile,
+            'total_seconds': round(time.perf_counter() - g.request_start, 6)
+        }
+    return payload
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    """Report uploads over MAX_UPLOAD_MB as JSON like the other errors"""
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'error': f"Upload exceeds the {limit_mb} MB limit"}), 413
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Expose request and pipeline metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def index():
     """Render the main UI page"""
@@ -28,39 +186,99 @@ def upload_sop():
     if file.filename == '':
         return jsonify({'error': 'Empty filename'}), 400
     
-    # Save file temporarily
-    filepath = os.path.join('data', file.filename)
-    file.save(filepath)
-    
     try:
         # Parse the SOP
-        parser = SopParser()
-        sop_data = parser.parse(filepath)
+        with _stage('sop_parse'):
+            sop_data, cache_hit = _parse_sop_upload(file)
+        _record_cache_lookup('sop_parse', cache_hit)
         
         # Calculate payment
-        calculator = PaymentCalculator()
-        payment_result = calculator.calculate(sop_data)
+        with _stage('payment_calculate'):
+            calculator = PaymentCalculator()
+            payment_result = calculator.calculate(sop_data)
         
         # Analyze for disputes
-        analyzer = DisputeAnalyzer()
-        dispute_result = analyzer.analyze(sop_data)
+        with _stage('dispute_analyze'):
+            analyzer = DisputeAnalyzer()
+            dispute_result = analyzer.analyze(sop_data)
         
         # Apply ML model for enhanced decision making
-        ml_model = MLModel()
-        ml_result = ml_model.predict(sop_data)
+        with _stage('ml_predict'):
+            with ml_model_pool.model() as ml_model:
+                ml_result = ml_model.predict(sop_data)
         
-        return jsonify({
+        return jsonify(_with_profile({
             'success': True,
             'payment_decision': payment_result,
             'dispute_analysis': dispute_result,
             'ml_enhanced_result': ml_result
-        })
+        }))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/upload_sop_batch', methods=['POST'])
+def upload_sop_batch():
+    """Handle upload and analysis of many SOP files in one request"""
+    files = [file for file in request.files.getlist('files') if file.filename != '']
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    
+    temp_dir = None
+    try:
+        # Cached SOPs are recognized from the request stream; only the others are saved
+        keys = [sop_parse_cache.key_for_stream(file.stream, file.filename) for file in files]
+        parsed = [sop_parse_cache.get(key) for key in keys]
+        misses = [index for index, sop_data in enumerate(parsed) if sop_data is None]
+        
+        futures = {}
+        if misses:
+            # Save files temporarily, in a directory private to this request
+            temp_dir = create_workspace(prefix='sop_batch_')
+            with _stage('upload_save'):
+                filepaths = {index: save_upload(files[index], temp_dir, prefix=f"{index}_") for index in misses}
+            
+            # Parse the uncached SOPs in parallel
+            with _stage('sop_parse_batch'):
+                futures = {index: sop_batch_parser.submit(filepath) for index, filepath in filepaths.items()}
+                for future in futures.values():
+                    future.exception()
+        
+        calculator = PaymentCalculator()
+        analyzer = DisputeAnalyzer()
+        results = []
+        
+        # One model is borrowed for the whole batch rather than per SOP
+        with ml_model_pool.model() as ml_model:
+            for index, file in enumerate(files):
+                try:
+                    sop_data = parsed[index]
+                    _record_cache_lookup('sop_parse', sop_data is not None)
+                    if sop_data is None:
+                        sop_data = futures[index].result()
+                        sop_parse_cache.put(keys[index], sop_data)
+                    
+                    results.append({
+                        'filename': file.filename,
+                        'success': True,
+                        'payment_decision': calculator.calculate(sop_data),
+                        'dispute_analysis': analyzer.analyze(sop_data),
+                        'ml_enhanced_result': ml_model.predict(sop_data)
+                    })
+                except Exception as e:
+                    results.append({'filename': file.filename, 'success': False, 'error': str(e)})
+        
+        return jsonify(_with_profile({
+            'success': True,
+            'total_files': len(files),
+            'failed_files': sum(1 for result in results if not result['success']),
+            'results': results
+        }))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        # Clean up temporary file
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        # Clean up temporary files
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
 @app.route('/upload_report', methods=['POST'])
 def upload_report():
@@ -74,256 +292,436 @@ def upload_report():
     if file.filename == '':
         return jsonify({'error': 'Empty filename'}), 400
     
-    # Save file temporarily
-    filepath = os.path.join('data', file.filename)
-    file.save(filepath)
-    
     try:
-        # Analyze the report
-        analyzer = ReportAnalyzer()
+        # Rate card analytics are looked up by content before anything is saved
+        cache_key = None
+        analysis_result = None
+        if report_type != 'settlement':
+            cache_key = rate_card_analysis_cache.key_for_stream(file.stream, file.filename)
+            analysis_result = rate_card_analysis_cache.get(cache_key)
+            _record_cache_lookup('rate_card_analysis', analysis_result is not None)
         
-        if report_type == 'settlement':
-            analysis_result = analyzer.analyze_settlement_report(filepath)
-        else:
-            analysis_result = analyzer.analyze_rate_card(filepath)
+        if analysis_result is None:
+            # Save file temporarily, in a directory private to this request
+            with upload_workspace() as upload_dir:
+                with _stage('upload_save'):
+                    filepath = save_upload(file, upload_dir)
+                
+                # Analyze the report
+                analyzer = ReportAnalyzer()
+                
+                if report_type == 'settlement':
+                    with _stage('settlement_analysis'):
+                        analysis_result = analyzer.analyze_settlement_report(filepath)
+                else:
+                    with _stage('rate_card_analysis'):
+                        analysis_result = analyzer.analyze_rate_card(filepath)
+                    rate_card_analysis_cache.put(cache_key, analysis_result)
         
-        return jsonify({
+        return jsonify(_with_profile({
             'success': True,
             'analysis_type': report_type,
             'analysis_result': analysis_result
-        })
+        }))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up temporary file
-        if os.path.exists(filepath):
-            os.remove(filepath)
 
-@app.route('/cross_check', methods=['POST'])
-def cross_check():
-    """Handle cross-checking of SOP, rate card, and settlement report"""
-    # Get uploaded files
+def _get_cross_check_uploads():
+    """Return the SOP, rate card and settlement uploads, or None if any is missing"""
     sop_file = request.files.get('sop_file')
     rate_card_file = request.files.get('rate_card_file')
     settlement_file = request.files.get('settlement_file')
     
     if not sop_file or not rate_card_file or not settlement_file:
-        return jsonify({'error': 'All three files (SOP, rate card, settlement report) are required'}), 400
+        return None
+    return sop_file, rate_card_file, settlement_file
+
+def _get_cached_cross_check(result_id):
+    """Return the cached cross-check result for result_id, or None"""
+    cross_check_result = cross_check_cache.get(result_id)
+    _record_cache_lookup('cross_check', cross_check_result is not None)
+    return cross_check_result
+
+def _run_cross_check(result_id, sop_path, rate_card_path, settlement_path):
+    """Cross-check saved files and cache the result under result_id"""
+    # Perform cross-checking
+    with _stage('cross_check'):
+        cross_checker = CrossChecker()
+        cross_check_result = cross_checker.cross_check_all(sop_path, rate_card_path, settlement_path)
     
-    # Save files temporarily
-    sop_path = os.path.join('data', sop_file.filename)
-    rate_card_path = os.path.join('data', rate_card_file.filename)
-    settlement_path = os.path.join('data', settlement_file.filename)
+    settlement_records = cross_check_result.get('data_summary', {}).get('settlement_records')
+    if isinstance(settlement_records, int):
+        ROWS_PROCESSED.inc(settlement_records, stage='cross_check')
     
-    sop_file.save(sop_path)
-    rate_card_file.save(rate_card_path)
-    settlement_file.save(settlement_path)
+    cross_check_cache.put(result_id, cross_check_result)
+    return cross_check_result
+
+def _cross_check_paths(result_id, sop_path, rate_card_path, settlement_path):
+    """Cross-check saved files, reusing the cached result for result_id if present"""
+    cross_check_result = _get_cached_cross_check(result_id)
+    if cross_check_result is not None:
+        return cross_check_result
+    return _run_cross_check(result_id, sop_path, rate_card_path, settlement_path)
+
+def _cross_check_uploads(sop_file, rate_card_file, settlement_file):
+    """Cross-check an upload set, reusing a cached result for identical files"""
+    with _stage('upload_hash'):
+        result_id = cross_check_cache.make_key(sop_file, rate_card_file, settlement_file)
+    cross_check_result = _get_cached_cross_check(result_id)
+    if cross_check_result is not None:
+        return result_id, cross_check_result
     
-    try:
-        # Perform cross-checking
+    # Save files temporarily, in a directory private to this request
+    with upload_workspace() as upload_dir:
+        with _stage('upload_save'):
+            sop_path = save_upload(sop_file, upload_dir, prefix='sop_')
+            rate_card_path = save_upload(rate_card_file, upload_dir, prefix='rate_card_')
+            settlement_path = save_upload(settlement_file, upload_dir, prefix='settlement_')
+        
+        cross_check_result = _run_cross_check(result_id, sop_path, rate_card_path, settlement_path)
+    
+    return result_id, cross_check_result
+
+def _write_report(report_type, cross_check_result, report_path):
+    """Write one of the Excel reports for a cross-check result, returning success"""
+    method_name = REPORT_TYPES[report_type][0]
+    cross_checker = CrossChecker()
+    return getattr(cross_checker, method_name)(cross_check_result, report_path)
+
+def _payment_and_dispute_members(report_dir):
+    """Return (archive name, path) pairs for the payment and dispute reports in report_dir"""
+    return [(filename, os.path.join(report_dir, filename)) for filename in PAYMENT_AND_DISPUTE_FILES]
+
+def _write_payment_and_dispute_reports(cross_check_result, report_dir):
+    """Write the payment and dispute reports for one cross-check result into report_dir"""
+    with _stage('report_payment_and_dispute'):
         cross_checker = CrossChecker()
-        cross_check_result = cross_checker.cross_check_all(sop_path, rate_card_path, settlement_path)
+        success = cross_checker.generate_payment_and_dispute_reports(cross_check_result, report_dir)
+    
+    if not success:
+        raise RuntimeError('Failed to generate payment and dispute reports')
+
+def _zip_payment_and_dispute_reports(report_dir, zip_path):
+    """Bundle the payment and dispute reports written to report_dir into one zip"""
+    with zipfile.ZipFile(zip_path, 'w') as zipf:
+        for arcname, path in _payment_and_dispute_members(report_dir):
+            zipf.write(path, arcname)
+
+def _send_report(report_type, cross_check_result, name):
+    """Write one of the Excel reports for a cross-check result and send it"""
+    _, prefix, error_message = REPORT_TYPES[report_type]
+    report_filename = f"{prefix}_{secure_filename(name) or 'report'}.xlsx"
+    
+    # Write into a directory private to this request, removed once the file has been sent
+    report_dir = create_workspace(prefix='report_')
+    report_path = os.path.join(report_dir, report_filename)
+    
+    try:
+        with _stage(f"report_{report_type}"):
+            success = _write_report(report_type, cross_check_result, report_path)
         
-        return jsonify({
-            'success': True,
-            'cross_check_result': cross_check_result
-        })
+        if success:
+            response = send_file(report_path, as_attachment=True)
+            response.call_on_close(lambda: shutil.rmtree(report_dir, ignore_errors=True))
+            return response
+    except Exception:
+        shutil.rmtree(report_dir, ignore_errors=True)
+        raise
+    
+    shutil.rmtree(report_dir, ignore_errors=True)
+    return jsonify({'error': error_message}), 500
+
+def _get_result_view_args():
+    """Read the view, fields and pagination arguments for a cross-check result"""
+    view = request.values.get('view', 'full')
+    if view not in ('full', 'summary'):
+        raise ValueError(f"Unknown view: {view}")
+    
+    fields = [field.strip() for field in request.values.get('fields', '').split(',') if field.strip()]
+    
+    page = None
+    page_size = None
+    if 'page' in request.values or 'page_size' in request.values:
+        try:
+            page = int(request.values.get('page', 1))
+            page_size = int(request.values.get('page_size', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ValueError('page and page_size must be integers')
+        if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"page must be at least 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+    
+    return view, fields, page, page_size
+
+def _cross_check_response(result_id, cross_check_result, view, fields, page, page_size):
+    """Build the JSON response for a cross-check result, applying the requested view"""
+    if fields:
+        cross_check_result = result_view.select_fields(cross_check_result, fields)
+    
+    payload = {'success': True, 'result_id': result_id}
+    if view == 'summary':
+        cross_check_result = result_view.summarize(cross_check_result)
+    elif page is not None:
+        payload['pagination'] = {
+            'page': page,
+            'page_size': page_size,
+            'totals': result_view.section_totals(cross_check_result)
+        }
+        cross_check_result = result_view.paginate(cross_check_result, page, page_size)
+    
+    payload['cross_check_result'] = cross_check_result
+    return Response(result_view.dumps(_with_profile(payload)), mimetype='application/json')
+
+@app.route('/cross_check', methods=['POST'])
+def cross_check():
+    """Handle cross-checking of SOP, rate card, and settlement report"""
+    uploads = _get_cross_check_uploads()
+    if uploads is None:
+        return jsonify({'error': 'All three files (SOP, rate card, settlement report) are required'}), 400
+    
+    try:
+        view_args = _get_result_view_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        result_id, cross_check_result = _cross_check_uploads(*uploads)
+        return _cross_check_response(result_id, cross_check_result, *view_args)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up temporary files
-        for path in [sop_path, rate_card_path, settlement_path]:
-            if os.path.exists(path):
-                os.remove(path)
+
+@app.route('/cross_check/<result_id>', methods=['GET'])
+def cross_check_by_result_id(result_id):
+    """Return a previously computed cross-check result, or one view or page of it"""
+    try:
+        view_args = _get_result_view_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    cross_check_result = _get_cached_cross_check(result_id)
+    if cross_check_result is None:
+        return jsonify({'error': 'Cross-check result not found or expired, please upload the files again'}), 404
+    
+    return _cross_check_response(result_id, cross_check_result, *view_args)
 
 @app.route('/generate_report', methods=['POST'])
 def generate_report():
     """Generate Excel report with tour analysis and remarks"""
-    # Get uploaded files
-    sop_file = request.files.get('sop_file')
-    rate_card_file = request.files.get('rate_card_file')
-    settlement_file = request.files.get('settlement_file')
-    
-    if not sop_file or not rate_card_file or not settlement_file:
+    uploads = _get_cross_check_uploads()
+    if uploads is None:
         return jsonify({'error': 'All three files (SOP, rate card, settlement report) are required'}), 400
     
-    # Save files temporarily
-    sop_path = os.path.join('data', sop_file.filename)
-    rate_card_path = os.path.join('data', rate_card_file.filename)
-    settlement_path = os.path.join('data', settlement_file.filename)
-    
-    sop_file.save(sop_path)
-    rate_card_file.save(rate_card_path)
-    settlement_file.save(settlement_path)
-    
     try:
-        # Perform cross-checking
-        cross_checker = CrossChecker()
-        cross_check_result = cross_checker.cross_check_all(sop_path, rate_card_path, settlement_path)
-        
-        # Generate Excel report
-        report_filename = f"tour_analysis_report_{sop_file.filename.split('.')[0]}.xlsx"
-        report_path = os.path.join('data', report_filename)
-        
-        success = cross_checker.generate_excel_report(cross_check_result, report_path)
-        
-        if success:
-            return send_file(report_path, as_attachment=True)
-        else:
-            return jsonify({'error': 'Failed to generate Excel report'}), 500
-            
+        _, cross_check_result = _cross_check_uploads(*uploads)
+        return _send_report('tour_analysis', cross_check_result, uploads[0].filename.split('.')[0])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up temporary files
-        for path in [sop_path, rate_card_path, settlement_path]:
-            if os.path.exists(path):
-                os.remove(path)
 
 @app.route('/generate_payment_report', methods=['POST'])
 def generate_payment_report():
     """Generate payment report Excel file"""
-    # Get uploaded files
-    sop_file = request.files.get('sop_file')
-    rate_card_file = request.files.get('rate_card_file')
-    settlement_file = request.files.get('settlement_file')
-    
-    if not sop_file or not rate_card_file or not settlement_file:
+    uploads = _get_cross_check_uploads()
+    if uploads is None:
         return jsonify({'error': 'All three files (SOP, rate card, settlement report) are required'}), 400
     
-    # Save files temporarily
-    sop_path = os.path.join('data', sop_file.filename)
-    rate_card_path = os.path.join('data', rate_card_file.filename)
-    settlement_path = os.path.join('data', settlement_file.filename)
-    
-    sop_file.save(sop_path)
-    rate_card_file.save(rate_card_path)
-    settlement_file.save(settlement_path)
-    
     try:
-        # Perform cross-checking
-        cross_checker = CrossChecker()
-        cross_check_result = cross_checker.cross_check_all(sop_path, rate_card_path, settlement_path)
-        
-        # Generate payment report
-        report_filename = f"payment_report_{sop_file.filename.split('.')[0]}.xlsx"
-        report_path = os.path.join('data', report_filename)
-        
-        success = cross_checker.generate_payment_report(cross_check_result, report_path)
-        
-        if success:
-            return send_file(report_path, as_attachment=True)
-        else:
-            return jsonify({'error': 'Failed to generate payment report'}), 500
-            
+        _, cross_check_result = _cross_check_uploads(*uploads)
+        return _send_report('payment', cross_check_result, uploads[0].filename.split('.')[0])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up temporary files
-        for path in [sop_path, rate_card_path, settlement_path]:
-            if os.path.exists(path):
-                os.remove(path)
 
 @app.route('/generate_dispute_report', methods=['POST'])
 def generate_dispute_report():
     """Generate dispute report Excel file"""
-    # Get uploaded files
-    sop_file = request.files.get('sop_file')
-    rate_card_file = request.files.get('rate_card_file')
-    settlement_file = request.files.get('settlement_file')
-    
-    if not sop_file or not rate_card_file or not settlement_file:
+    uploads = _get_cross_check_uploads()
+    if uploads is None:
         return jsonify({'error': 'All three files (SOP, rate card, settlement report) are required'}), 400
     
-    # Save files temporarily
-    sop_path = os.path.join('data', sop_file.filename)
-    rate_card_path = os.path.join('data', rate_card_file.filename)
-    settlement_path = os.path.join('data', settlement_file.filename)
+    try:
+        _, cross_check_result = _cross_check_uploads(*uploads)
+        return _send_report('dispute', cross_check_result, uploads[0].filename.split('.')[0])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/reports/<result_id>', methods=['GET', 'POST'])
+def report_by_result_id(result_id):
+    """Generate a report from a previously computed cross-check result"""
+    report_type = request.values.get('report_type', 'tour_analysis')
+    if report_type not in REPORT_TYPES:
+        return jsonify({'error': f"Unknown report type: {report_type}"}), 400
     
-    sop_file.save(sop_path)
-    rate_card_file.save(rate_card_path)
-    settlement_file.save(settlement_path)
+    cross_check_result = _get_cached_cross_check(result_id)
+    if cross_check_result is None:
+        return jsonify({'error': 'Cross-check result not found or expired, please upload the files again'}), 404
     
     try:
-        # Perform cross-checking
-        cross_checker = CrossChecker()
-        cross_check_result = cross_checker.cross_check_all(sop_path, rate_card_path, settlement_path)
-        
-        # Generate dispute report
-        report_filename = f"dispute_report_{sop_file.filename.split('.')[0]}.xlsx"
-        report_path = os.path.join('data', report_filename)
-        
-        success = cross_checker.generate_dispute_report(cross_check_result, report_path)
-        
-        if success:
-            return send_file(report_path, as_attachment=True)
-        else:
-            return jsonify({'error': 'Failed to generate dispute report'}), 500
-            
+        return _send_report(report_type, cross_check_result, result_id[:12])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up temporary files
-        for path in [sop_path, rate_card_path, settlement_path]:
-            if os.path.exists(path):
-                os.remove(path)
 
 @app.route('/generate_payment_and_dispute_reports', methods=['POST'])
 def generate_payment_and_dispute_reports():
     """Generate separate payment and dispute reports with exact data from settlement file"""
-    # Get uploaded files
-    sop_file = request.files.get('sop_file')
-    rate_card_file = request.files.get('rate_card_file')
-    settlement_file = request.files.get('settlement_file')
-    
-    if not sop_file or not rate_card_file or not settlement_file:
+    uploads = _get_cross_check_uploads()
+    if uploads is None:
         return jsonify({'error': 'All three files (SOP, rate card, settlement report) are required'}), 400
-    
-    # Save files temporarily
-    sop_path = os.path.join('data', sop_file.filename)
-    rate_card_path = os.path.join('data', rate_card_file.filename)
-    settlement_path = os.path.join('data', settlement_file.filename)
-    
-    sop_file.save(sop_path)
-    rate_card_file.save(rate_card_path)
-    settlement_file.save(settlement_path)
+    sop_file = uploads[0]
     
     try:
-        # Perform cross-checking
-        cross_checker = CrossChecker()
-        cross_check_result = cross_checker.cross_check_all(sop_path, rate_card_path, settlement_path)
+        _, cross_check_result = _cross_check_uploads(*uploads)
         
-        # Create a temporary directory for the reports
-        temp_dir = tempfile.mkdtemp()
+        # Create a temporary directory for the reports, private to this request
+        temp_dir = create_workspace(prefix='reports_')
         
-        # Generate payment and dispute reports
-        success = cross_checker.generate_payment_and_dispute_reports(cross_check_result, temp_dir)
+        try:
+            # Generate payment and dispute reports
+            _write_payment_and_dispute_reports(cross_check_result, temp_dir)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
         
-        if success:
-            # Return both files as a zip
-            import zipfile
-            zip_filename = f"payment_dispute_reports_{sop_file.filename.split('.')[0]}.zip"
-            zip_path = os.path.join('data', zip_filename)
-            
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
-                zipf.write(os.path.join(temp_dir, 'payment_report.xlsx'), 'payment_report.xlsx')
-                zipf.write(os.path.join(temp_dir, 'dispute_report.xlsx'), 'dispute_report.xlsx')
-            
-            # Clean up temporary directory
-            import shutil
-            shutil.rmtree(temp_dir)
-            
-            return send_file(zip_path, as_attachment=True)
-        else:
-            return jsonify({'error': 'Failed to generate payment and dispute reports'}), 500
-            
+        # Stream both files back as a zip, removing the directory once it has been sent
+        zip_filename = f"payment_dispute_reports_{secure_filename(sop_file.filename.split('.')[0]) or 'report'}.zip"
+        
+        response = Response(
+            stream_zip(_payment_and_dispute_members(temp_dir)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename="{zip_filename}"'}
+        )
+        response.call_on_close(lambda: shutil.rmtree(temp_dir, ignore_errors=True))
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+def _run_job(job):
+    """Worker body for a background job: cross-check, then write any report"""
+    result_id = job.params['result_id']
+    paths = job.params['paths']
+    name = job.params['name']
+    
+    try:
+        cross_check_result = _cross_check_paths(result_id, *paths)
     finally:
-        # Clean up temporary files
-        for path in [sop_path, rate_card_path, settlement_path]:
+        # The uploads are not needed once the cross-check has run
+        for path in paths:
             if os.path.exists(path):
                 os.remove(path)
+    
+    job.check_cancelled()
+    
+    if job.job_type == 'cross_check':
+        return {'success': True, 'job_id': job.id, 'result_id': result_id, 'cross_check_result': cross_check_result}
+    
+    if job.job_type == 'payment_and_dispute':
+        _write_payment_and_dispute_reports(cross_check_result, job.work_dir)
+        
+        job.check_cancelled()
+        zip_path = os.path.join(job.work_dir, f"payment_dispute_reports_{name}.zip")
+        _zip_payment_and_dispute_reports(job.work_dir, zip_path)
+        job.output_path = zip_path
+    else:
+        _, prefix, error_message = REPORT_TYPES[job.job_type]
+        report_path = os.path.join(job.work_dir, f"{prefix}_{name}.xlsx")
+        with _stage(f"report_{job.job_type}"):
+            success = _write_report(job.job_type, cross_check_result, report_path)
+        if not success:
+            raise RuntimeError(error_message)
+        job.output_path = report_path
+    
+    return {'success': True, 'job_id': job.id, 'result_id': result_id}
+
+# Job state, results and reports live under JOB_DIR, so any worker process can serve them
+job_queue = JobQueue(
+    _run_job,
+    os.environ.get('JOB_DIR', os.path.join('data', 'jobs')),
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('JOB_QUEUE_DEPTH', 16)),
+    retention_seconds=int(os.environ.get('JOB_RETENTION', 3600)),
+    dumps=result_view.dumps
+)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue cross-checking and report generation to run in the background"""
+    # Refuse before the request body is parsed, so a full queue costs no upload I/O
+    if not job_queue.has_capacity():
+        return jsonify({'error': 'Job queue is full, try again later'}), 503
+    
+    job_type = request.form.get('job_type', 'cross_check')
+    if job_type not in JOB_TYPES:
+        return jsonify({'error': f"Unknown job type: {job_type}"}), 400
+    
+    uploads = _get_cross_check_uploads()
+    if uploads is None:
+        return jsonify({'error': 'All three files (SOP, rate card, settlement report) are required'}), 400
+    
+    result_id = cross_check_cache.make_key(*uploads)
+    job = job_queue.create(job_type)
+    
+    # The request stream is gone once we return, so keep the uploads in the job's directory
+    try:
+        paths = [
+            save_upload(file, job.work_dir, prefix=f"{role}_")
+            for role, file in zip(('sop', 'rate_card', 'settlement'), uploads)
+        ]
+    except Exception as e:
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+        return jsonify({'error': str(e)}), 500
+    
+    job.params = {
+        'result_id': result_id,
+        'paths': paths,
+        'name': secure_filename(uploads[0].filename.split('.')[0]) or 'report'
+    }
+    try:
+        job_queue.submit(job)
+    except JobQueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report the status of a background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Return the JSON result of a completed background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status != Job.COMPLETED:
+        return jsonify({'error': f"Job is {job.status}", 'job': job.to_dict()}), 409
+    if job.result_path is None:
+        return jsonify({'error': 'Job has no result'}), 404
+    
+    return send_file(job.result_path, mimetype='application/json')
+
+@app.route('/jobs/<job_id>/download', methods=['GET'])
+def job_download(job_id):
+    """Download the report produced by a completed background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status != Job.COMPLETED:
+        return jsonify({'error': f"Job is {job.status}", 'job': job.to_dict()}), 409
+    if job.output_path is None:
+        return jsonify({'error': 'Job has no downloadable output'}), 404
+    
+    return send_file(job.output_path, as_attachment=True)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running background job"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
 
 if __name__ == '__main__':
+    if os.environ.get('ML_MODEL_PRELOAD') == '1':
+        ml_model_pool.warm()
     app.run(debug=True)
\ No newline at end of file
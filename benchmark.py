@@ -0,0 +1,372 @@
+"""
+Benchmark harness for the SOP -> cross-check -> report pipeline
+
+Generates deterministic synthetic SOPs, rate cards and settlement reports
+at the requested scales, times every pipeline stage in a fresh process and
+records wall time, peak RSS and rows/sec to a baseline JSON file.
+
+Usage:
+    python benchmark.py --rows 1000,100000 --output bench_baseline.json
+    python benchmark.py --rows 1000,100000 --compare bench_baseline.json
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+VEHICLE_TYPES = ['bike', 'car', 'van', 'truck', 'heavy truck']
+BASE_RATES = {'bike': 8.0, 'car': 12.0, 'van': 18.0, 'truck': 32.0, 'heavy truck': 55.0}
+CITIES = [
+    'Bangalore', 'Chennai', 'Hyderabad', 'Mumbai', 'Pune', 'Delhi',
+    'Kolkata', 'Ahmedabad', 'Jaipur', 'Lucknow', 'Nagpur', 'Indore'
+]
+DISTANCE_SLABS = [(0, 50), (50, 150), (150, 300), (300, 600), (600, 1200)]
+STAGES = [
+    'sop_parse', 'payment_calculate', 'dispute_analyze', 'ml_predict',
+    'cross_check_all', 'generate_excel_report', 'generate_payment_report', 'generate_dispute_report'
+]
+SOP_INPUT_STAGES = ('payment_calculate', 'dispute_analyze', 'ml_predict')
+REPORT_STAGES = ('generate_excel_report', 'generate_payment_report', 'generate_dispute_report')
+
+
+def generate_sop(path, rng, pages=5):
+    """Write a synthetic SOP text file mentioning every factor the parser looks for"""
+    vehicle_type = rng.choice(VEHICLE_TYPES)
+    lines = [
+        'Standard Operating Procedure - Middle Mile Line Haul',
+        '',
+        f"Vehicle Type: {vehicle_type}",
+        f"Advance Amount: ${rng.randint(1, 20) * 500}",
+        f"Delivery Distance: {rng.randint(20, 1200)} km",
+        f"Delivery Time: {rng.randint(4, 72)} hours",
+        f"Vendor Rating: {rng.randint(25, 50) / 10:.1f}",
+        f"Shipment Value: ${rng.randint(5, 500) * 1000}",
+        f"Special Handling: {rng.choice(['Yes', 'No'])}",
+        f"Hazardous Materials: {rng.choice(['Yes', 'No'])}",
+        f"Fragile Goods: {rng.choice(['Yes', 'No'])}",
+        ''
+    ]
+
+    # Filler clauses so extraction cost scales with document length
+    for page in range(pages):
+        lines.append(f"Section {page + 1}")
+        for clause in range(40):
+            lines.append(
+                f"{page + 1}.{clause + 1} The carrier shall report tour status to the "
+                f"operations team within {rng.randint(1, 24)} hours of any deviation "
+                f"from the agreed lane between {rng.choice(CITIES)} and {rng.choice(CITIES)}."
+            )
+        lines.append('')
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+
+
+def generate_rate_card(path, rng, rows):
+    """Write a synthetic rate card CSV with one row per lane, vehicle type and distance slab"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['lane_id', 'origin', 'destination', 'vehicle_type',
+                         'min_distance_km', 'max_distance_km', 'rate_per_km', 'fixed_charge'])
+        for index in range(rows):
+            origin, destination = rng.sample(CITIES, 2)
+            vehicle_type = rng.choice(VEHICLE_TYPES)
+            min_distance, max_distance = rng.choice(DISTANCE_SLABS)
+            writer.writerow([
+                f"LANE{index:07d}", origin, destination, vehicle_type,
+                min_distance, max_distance,
+                round(BASE_RATES[vehicle_type] * rng.uniform(0.85, 1.15), 2),
+                rng.randint(0, 20) * 100
+            ])
+
+
+def generate_settlement(path, rng, rows, vendors=200):
+    """Write a synthetic settlement report CSV with one row per tour"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['tour_id', 'vendor_id', 'vendor_name', 'origin', 'destination',
+                         'vehicle_type', 'distance_km', 'delivery_time_hours',
+                         'expected_amount', 'paid_amount', 'advance_amount', 'status'])
+        for index in range(rows):
+            vendor = rng.randrange(vendors)
+            origin, destination = rng.sample(CITIES, 2)
+            vehicle_type = rng.choice(VEHICLE_TYPES)
+            distance = round(rng.uniform(10, 1200), 1)
+            expected = round(distance * BASE_RATES[vehicle_type], 2)
+
+            # Roughly 5% of tours are mispaid so discrepancy paths are exercised
+            paid = expected if rng.random() > 0.05 else round(expected * rng.uniform(0.5, 1.5), 2)
+            writer.writerow([
+                f"TOUR{index:09d}", f"V{vendor:04d}", f"Vendor {vendor}", origin, destination,
+                vehicle_type, distance, round(distance / rng.uniform(30, 60), 1),
+                expected, paid, round(expected * rng.choice([0, 0.1, 0.2]), 2),
+                rng.choice(['settled', 'settled', 'settled', 'pending', 'disputed'])
+            ])
+
+
+def generate_dataset(data_dir, rows, seed=42):
+    """Generate the SOP, rate card and settlement files for one scale"""
+    rng = random.Random(seed + rows)
+    os.makedirs(data_dir, exist_ok=True)
+    paths = {
+        'sop': os.path.join(data_dir, f"bench_sop_{rows}.txt"),
+        'rate_card': os.path.join(data_dir, f"bench_rate_card_{rows}.csv"),
+        'settlement': os.path.join(data_dir, f"bench_settlement_{rows}.csv")
+    }
+    generate_sop(paths['sop'], rng)
+    generate_rate_card(paths['rate_card'], rng, max(100, rows // 10))
+    generate_settlement(paths['settlement'], rng, rows)
+    return paths
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    if platform.system() == 'Darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _current_rss_mb():
+    # Resident set size right now, unlike ru_maxrss, which is the peak so far
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        # No procfs outside Linux
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def _prepare_input(name, paths, inputs_dir):
+    """Compute a stage input (parsed SOP or cross-check result) and pickle it to inputs_dir"""
+    if name == 'sop_data':
+        from services.sop_parser import SopParser
+        value = SopParser().parse(paths['sop'])
+    else:
+        from services.cross_checker import CrossChecker
+        value = CrossChecker().cross_check_all(paths['sop'], paths['rate_card'], paths['settlement'])
+
+    with open(os.path.join(inputs_dir, f"{name}.pickle"), 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return {}
+
+
+def _load_input(name, inputs_dir):
+    with open(os.path.join(inputs_dir, f"{name}.pickle"), 'rb') as f:
+        return pickle.load(f)
+
+
+def _run_stage(stage, paths, inputs_dir, output_dir):
+    """
+    Run one stage and return its wall time and memory use.
+
+    Prerequisites are computed beforehand in their own process and only
+    loaded here, so the stage's peak RSS does not include their peak.
+    baseline_rss_mb is the current RSS right before the timed call:
+    interpreter, the stage's own imports and loaded inputs. Only the
+    module the stage needs is imported, so scikit-learn and TensorFlow
+    are only loaded for ml_predict.
+    """
+    if stage == 'sop_parse':
+        from services.sop_parser import SopParser
+        target, args = SopParser().parse, (paths['sop'],)
+    elif stage == 'payment_calculate':
+        from services.payment_calculator import PaymentCalculator
+        target, args = PaymentCalculator().calculate, (_load_input('sop_data', inputs_dir),)
+    elif stage == 'dispute_analyze':
+        from services.dispute_analyzer import DisputeAnalyzer
+        target, args = DisputeAnalyzer().analyze, (_load_input('sop_data', inputs_dir),)
+    elif stage == 'ml_predict':
+        from models.ml_model import MLModel
+        target, args = MLModel().predict, (_load_input('sop_data', inputs_dir),)
+    elif stage == 'cross_check_all':
+        from services.cross_checker import CrossChecker
+        target, args = CrossChecker().cross_check_all, (paths['sop'], paths['rate_card'], paths['settlement'])
+    else:
+        from services.cross_checker import CrossChecker
+        report_path = os.path.join(output_dir, f"{stage}.xlsx")
+        target = getattr(CrossChecker(), stage)
+        args = (_load_input('cross_check_result', inputs_dir), report_path)
+
+    baseline_rss = _current_rss_mb()
+    start = time.perf_counter()
+    target(*args)
+    wall_time = time.perf_counter() - start
+    return {'wall_time_s': wall_time, 'baseline_rss_mb': baseline_rss, 'peak_rss_mb': _peak_rss_mb()}
+
+
+def _worker(target, args, conn):
+    try:
+        conn.send(target(*args))
+    except Exception as e:
+        conn.send({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def _run_in_process(target, *args):
+    """Run target(*args) in a fresh process and return its result dict"""
+    parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_worker, args=(target, args, child_conn))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        # The child died without reporting, e.g. killed for running out of memory
+        result = None
+    process.join()
+
+    if result is None:
+        result = {'error': f"process exited with code {process.exitcode} before reporting a result"}
+    return result
+
+
+def measure_stage(stage, paths, rows, inputs_dir, output_dir):
+    """Run a stage in a fresh process so its peak RSS is not polluted by earlier stages"""
+    result = _run_in_process(_run_stage, stage, paths, inputs_dir, output_dir)
+    if 'error' not in result:
+        # Per-SOP stages process one document regardless of settlement size
+        units = rows if stage == 'cross_check_all' or stage.startswith('generate_') else 1
+        result['rows'] = units
+        result['rows_per_s'] = units / result['wall_time_s'] if result['wall_time_s'] > 0 else None
+    return result
+
+
+def _run_scale(rows, stages, data_dir, seed, output_dir):
+    """Generate the data for one scale and measure every stage on it"""
+    print(f"Generating dataset with {rows} settlement rows...")
+    paths = generate_dataset(data_dir, rows, seed)
+
+    # Inputs of the later stages, computed once per scale outside the measured processes
+    inputs_dir = tempfile.mkdtemp(prefix='bench_inputs_')
+    try:
+        input_errors = {}
+        needed = set()
+        if any(stage in SOP_INPUT_STAGES for stage in stages):
+            needed.add('sop_data')
+        if any(stage in REPORT_STAGES for stage in stages):
+            needed.add('cross_check_result')
+        for name in sorted(needed):
+            prepared = _run_in_process(_prepare_input, name, paths, inputs_dir)
+            if 'error' in prepared:
+                input_errors[name] = prepared['error']
+
+        results = {}
+        for stage in stages:
+            input_name = 'sop_data' if stage in SOP_INPUT_STAGES else 'cross_check_result' if stage in REPORT_STAGES else None
+            if input_name in input_errors:
+                result = {'error': f"preparing {input_name} failed: {input_errors[input_name]}"}
+            else:
+                result = measure_stage(stage, paths, rows, inputs_dir, output_dir)
+            results[stage] = result
+            if 'error' in result:
+                print(f"  {stage:<26} ERROR {result['error']}")
+            else:
+                print(f"  {stage:<26} {result['wall_time_s']:9.3f}s "
+                      f"{result['peak_rss_mb']:9.1f} MB {result['rows_per_s'] or 0:12.0f} rows/s")
+        return results
+    finally:
+        shutil.rmtree(inputs_dir, ignore_errors=True)
+
+
+def run_benchmarks(scales, stages, data_dir, seed, checkpoint=None):
+    """
+    Generate data and measure every stage at every scale.
+
+    checkpoint(results) is called after each scale, so the stages measured
+    so far are kept even if a later, larger scale does not finish.
+    """
+    results = {}
+    output_dir = tempfile.mkdtemp(prefix='bench_reports_')
+    try:
+        for rows in scales:
+            results[str(rows)] = _run_scale(rows, stages, data_dir, seed, output_dir)
+            if checkpoint is not None:
+                checkpoint(results)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+def write_results(path, results, seed):
+    """Write the results measured so far, with the environment they were measured in"""
+    with open(path, 'w') as f:
+        json.dump({
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+            'results': results
+        }, f, indent=2)
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Print stages whose wall time regressed by more than threshold against the baseline"""
+    regressions = 0
+    for rows, stages in results.items():
+        for stage, result in stages.items():
+            previous = baseline.get('results', {}).get(rows, {}).get(stage)
+            if not previous or 'error' in previous or 'error' in result:
+                continue
+            ratio = result['wall_time_s'] / previous['wall_time_s'] if previous['wall_time_s'] else 1.0
+            if ratio > 1 + threshold:
+                regressions += 1
+                print(f"REGRESSION {rows} rows {stage}: {previous['wall_time_s']:.3f}s -> "
+                      f"{result['wall_time_s']:.3f}s ({(ratio - 1) * 100:+.1f}%)")
+    if not regressions:
+        print("No regressions against baseline")
+    return regressions
+
+
+def main():
+    """Run the benchmark suite"""
+    parser = argparse.ArgumentParser(description='Benchmark the SOP -> cross-check -> report pipeline')
+    parser.add_argument('--rows', default='1000,10000,100000',
+                        help='comma-separated settlement row counts (1000 to 10000000)')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated stages to run')
+    parser.add_argument('--data-dir', default=os.path.join('data', 'bench'), help='where generated files go')
+    parser.add_argument('--seed', type=int, default=42, help='seed for the data generator')
+    parser.add_argument('--output', default='bench_baseline.json', help='file the results are written to')
+    parser.add_argument('--compare', help='baseline file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown before a regression is reported')
+    args = parser.parse_args()
+
+    scales = [int(rows) for rows in args.rows.split(',')]
+    stages = [stage for stage in args.stages.split(',') if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    # Read the baseline first so --compare and --output may name the same file
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print("=== Middle Mile Pipeline Benchmark ===")
+    results = run_benchmarks(scales, stages, args.data_dir, args.seed,
+                             checkpoint=lambda partial: write_results(args.output, partial, args.seed))
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        if compare_to_baseline(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Cross-check a portfolio of vendors in parallel
+
+Usage:
+    python cross_check_portfolio.py manifest.csv --output portfolio_result.json
+    python cross_check_portfolio.py vendors_dir/ --workers 16
+"""
+import argparse
+import json
+import os
+import sys
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from services.portfolio import PortfolioCrossChecker, discover_triples, load_manifest
+
+
+def main():
+    """Run the portfolio cross-check and write the consolidated result"""
+    parser = argparse.ArgumentParser(description='Cross-check many vendor SOP / rate card / settlement triples')
+    parser.add_argument('source', help='manifest (.csv or .json) or a directory with one folder per vendor')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--output', default='portfolio_result.json', help='file the full result is written to')
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        triples = discover_triples(args.source)
+    else:
+        triples = load_manifest(args.source)
+
+    print(f"=== Portfolio Cross-Check: {len(triples)} vendors ===")
+    result = PortfolioCrossChecker(max_workers=args.workers).run(triples)
+
+    summary = result['summary']
+    print(f"Vendors: {summary['succeeded']} succeeded, {summary['failed']} failed "
+          f"({summary['unique_cross_checks']} unique cross-checks)")
+    print(f"Expected Payment: ${summary['expected_payment']:.2f}")
+    print(f"Actual Payment: ${summary['actual_payment']:.2f}")
+    print(f"Payment Variance: ${summary['variance']:.2f}")
+    print(f"Consistency Issues: {summary['consistency_issues']}")
+    print(f"Risk Severity: {summary['risk_severity_counts']}")
+    for failure in summary['failed_vendors']:
+        print(f"  FAILED {failure['vendor']}: {failure['error']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2, default=str)
+    print(f"Full results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+Gunicorn settings for running Middle Mile Support in production
+
+Every setting can be overridden through the environment variable named next
+to it, e.g. WEB_CONCURRENCY=8 gunicorn wsgi:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+# Cross-checking and report writing are CPU-bound, so one worker per core
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# The app sizes its per-worker SOP parsing pools from the worker count
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.environ.get('WEB_THREADS', 2))
+worker_class = 'gthread'
+
+# Import the app in the master before forking, so a broken import fails at startup
+# rather than in every worker. Only imported code is shared this way; the ML models
+# are loaded by each worker after the fork (post_worker_init)
+preload_app = True
+
+# Recycle workers after a bounded number of requests so memory growth from
+# large settlements cannot accumulate; jitter keeps them from restarting together.
+# Job state is kept in JOB_DIR, so a recycled worker's jobs are taken over by another
+max_requests = int(os.environ.get('MAX_REQUESTS', 500))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', 50))
+
+# Month-end settlements can take minutes; long work should go through /jobs
+timeout = int(os.environ.get('WORKER_TIMEOUT', 300))
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 60))
+keepalive = 5
+
+# Header limits; the request body limit is MAX_UPLOAD_MB, enforced by the app
+limit_request_line = 8190
+limit_request_fields = 100
+
+accesslog = os.environ.get('ACCESS_LOG', '-')
+errorlog = os.environ.get('ERROR_LOG', '-')
+
+
+def post_worker_init(worker):
+    """Load the ML models in each worker once it has been forked"""
+    if os.environ.get('ML_MODEL_PRELOAD', '1') == '1':
+        from app import ml_model_pool
+        ml_model_pool.warm()
\ No newline at end of file
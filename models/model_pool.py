@@ -0,0 +1,80 @@
+"""
+Pool of preloaded ML models shared by the requests of one worker process
+"""
+import threading
+from contextlib import contextmanager
+
+
+class ModelPool:
+    """
+    Hands out MLModel instances that stay loaded between requests.
+
+    Models are created on first use (or up front with warm()) and never
+    more than size of them exist, so each one is loaded once per process.
+    A request borrows an instance exclusively for the duration of
+    predict, which keeps predictions thread-safe without a global lock.
+    """
+
+    def __init__(self, size=1, factory=None):
+        self.size = max(1, size)
+        self._factory = factory or self._load_model
+        self._idle = []
+        self._created = 0
+        # Guards _idle and _created; waiters are woken when a model is
+        # returned and when a failed load gives its slot back
+        self._available = threading.Condition()
+
+    @staticmethod
+    def _load_model():
+        # Imported here so that importing the app does not pull in
+        # scikit-learn and TensorFlow until a prediction is needed
+        from models.ml_model import MLModel
+        return MLModel()
+
+    def warm(self):
+        """Load every model in the pool now instead of on first use"""
+        while self._reserve():
+            self._release(self._create())
+
+    @contextmanager
+    def model(self):
+        """Borrow a loaded model, waiting for one if all are in use"""
+        model = self._acquire()
+        try:
+            yield model
+        finally:
+            self._release(model)
+
+    def _acquire(self):
+        with self._available:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    # Load outside the lock so other borrowers are not held up
+                    self._created += 1
+                    break
+                self._available.wait()
+        return self._create()
+
+    def _release(self, model):
+        with self._available:
+            self._idle.append(model)
+            self._available.notify()
+
+    def _reserve(self):
+        with self._available:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def _create(self):
+        try:
+            return self._factory()
+        except Exception:
+            # Give the slot back and wake a waiter, which retries the load
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
\ No newline at end of file
@@ -0,0 +1,409 @@
+"""
+Background job queue for cross-checking and report generation
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows, where the development server is the only process
+    fcntl = None
+
+STATE_FILE = 'job.json'
+LOCK_FILE = 'job.lock'
+CANCEL_FILE = 'cancel'
+RESULT_FILE = 'result.json'
+
+
+class JobQueueFullError(Exception):
+    """Raised when the queue already holds the maximum number of pending jobs"""
+
+
+class JobCancelledError(Exception):
+    """Raised inside a running job once it has been cancelled"""
+
+
+class Job:
+    """State of a single background job"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, job_type, work_dir, params=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.job_type = job_type
+        self.work_dir = work_dir
+        self.params = params or {}
+        self.status = Job.QUEUED
+        self.output_path = None
+        self.has_result = False
+        self.error = None
+        self.attempts = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (Job.COMPLETED, Job.FAILED, Job.CANCELLED)
+
+    @property
+    def cancel_requested(self):
+        # Cancellation may come from another worker process, through a marker file
+        return self._cancel_event.is_set() or os.path.exists(os.path.join(self.work_dir, CANCEL_FILE))
+
+    @property
+    def result_path(self):
+        """Path of the stored JSON result, or None if the job has none"""
+        return os.path.join(self.work_dir, RESULT_FILE) if self.has_result else None
+
+    def check_cancelled(self):
+        """Stop the job between stages if cancellation was requested"""
+        if self.cancel_requested:
+            raise JobCancelledError(f"Job {self.id} was cancelled")
+
+    def to_dict(self):
+        """Return the job status as a JSON-serializable dict"""
+        return {
+            'job_id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'error': self.error,
+            'has_output': self.output_path is not None,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+    def to_state(self):
+        """Return everything needed to resume or report on the job from another process"""
+        state = self.to_dict()
+        state.update({
+            'params': self.params,
+            'output_file': os.path.basename(self.output_path) if self.output_path else None,
+            'has_result': self.has_result,
+            'attempts': self.attempts
+        })
+        return state
+
+    @classmethod
+    def from_state(cls, state, work_dir):
+        """Rebuild a job from the state written by to_state"""
+        job = cls(state['job_type'], work_dir, params=state.get('params'), job_id=state['job_id'])
+        job.status = state['status']
+        job.error = state.get('error')
+        job.has_result = state.get('has_result', False)
+        job.attempts = state.get('attempts', 0)
+        job.created_at = state.get('created_at')
+        job.started_at = state.get('started_at')
+        job.finished_at = state.get('finished_at')
+        if state.get('output_file'):
+            job.output_path = os.path.join(work_dir, state['output_file'])
+        return job
+
+
+class JobQueue:
+    """
+    Runs jobs on a bounded thread pool, with their state kept on disk.
+
+    Each job has a directory under jobs_dir holding its uploads, its state,
+    its JSON result and any report it writes. Every web worker pointed at
+    the same jobs_dir can therefore report on, cancel and serve the output
+    of any job, whichever worker runs it. The worker running a job holds a
+    lock on its directory. If that worker exits first, for instance because
+    it was recycled, another worker adopts the job and runs it again, up to
+    max_attempts times in total.
+
+    At most max_workers jobs run at once per process and at most
+    max_pending wait to start across all processes; further submissions
+    are rejected with JobQueueFullError, and has_capacity() lets callers
+    check before accepting uploads. Finished jobs, and their directories,
+    are kept for retention_seconds so results can be polled and
+    downloaded; expired ones are removed at most every prune_interval
+    seconds, during the scan that counts pending jobs or on a poll.
+
+    Jobs run on threads rather than processes so they work on the worker's
+    own caches and model pool, and a cross-check result is never copied to
+    another process. Throughput across cores comes from running several
+    web worker processes, each with its own small job pool.
+
+    runner(job) does the work. Its return value, if not None, is stored as
+    the job's result with dumps, and it may set job.output_path to a file
+    in job.work_dir.
+    """
+
+    def __init__(self, runner, jobs_dir, max_workers=2, max_pending=16, retention_seconds=3600,
+                 max_attempts=2, prune_interval=60, dumps=json.dumps):
+        self.runner = runner
+        # Absolute, so paths handed to send_file do not depend on the app's root path
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.max_attempts = max_attempts
+        self.prune_interval = prune_interval
+        self.dumps = dumps
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+        self._jobs = {}
+        self._held_locks = {}
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+
+    def create(self, job_type, params=None):
+        """Create a job and its directory; it starts once it has been submitted"""
+        job_id = uuid.uuid4().hex
+        work_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(work_dir)
+        return Job(job_type, work_dir, params, job_id)
+
+    def has_capacity(self):
+        """Return whether a submission would be accepted now, before any upload is saved"""
+        with self._lock:
+            return self._scan_locked() < self.max_pending
+
+    def submit(self, job):
+        """Queue a created job; its directory is removed if the queue is full"""
+        with self._lock:
+            pending = self._scan_locked()
+            if pending >= self.max_pending:
+                self._remove_work_dir(job)
+                raise JobQueueFullError(f"Job queue is full ({pending} jobs waiting), try again later")
+
+            # Locked before the state is visible, so no other worker takes it for orphaned
+            self._claim(job)
+            self._enqueue_locked(job)
+        return job
+
+    def get(self, job_id):
+        """Return the job with the given id, or None"""
+        with self._lock:
+            if self._prune_due():
+                self._scan_locked()
+
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job
+
+            job = self._load(job_id)
+            if job is None or job.finished:
+                return job
+            return self._adopt_if_orphaned_locked(job)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. Queued jobs never start; running jobs stop at the next
+        stage boundary and their result is discarded.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._load(job_id)
+                if job is None or job.finished:
+                    return job
+
+                # Run by another worker: leave a marker that it checks between stages
+                open(os.path.join(job.work_dir, CANCEL_FILE), 'w').close()
+                return self._adopt_if_orphaned_locked(job)
+
+            job._cancel_event.set()
+            if job.future.cancel():
+                self._finish_locked(job, Job.CANCELLED)
+            return job
+
+    def _enqueue_locked(self, job):
+        job.status = Job.QUEUED
+        self._jobs[job.id] = job
+        self._save(job)
+        job.future = self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        with self._lock:
+            if job.cancel_requested:
+                self._finish_locked(job, Job.CANCELLED)
+                return
+            job.status = Job.RUNNING
+            job.started_at = time.time()
+            job.attempts += 1
+            self._save(job)
+
+        status = Job.COMPLETED
+        try:
+            result = self.runner(job)
+            job.check_cancelled()
+            if result is not None:
+                self._write_result(job, result)
+        except JobCancelledError:
+            status = Job.CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            status = Job.FAILED
+
+        with self._lock:
+            self._finish_locked(job, status)
+
+    def _finish_locked(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+
+        # Only completed jobs keep their result and output around for download
+        if status != Job.COMPLETED:
+            job.output_path = None
+            job.has_result = False
+            self._clear_work_dir(job)
+
+        self._save(job)
+        self._jobs.pop(job.id, None)
+        self._release(job)
+
+    def _adopt_if_orphaned_locked(self, job):
+        """Take over an unfinished job whose worker has exited; returns its current state"""
+        # An unfinished job whose lock is free has lost its worker
+        if job.id in self._jobs or not self._claim(job):
+            return job
+
+        # Re-read now that it is locked: the previous owner may have just finished it
+        current = self._load(job.id)
+        if current is None or current.finished:
+            self._release(job)
+            return current or job
+
+        if current.attempts >= self.max_attempts:
+            current.error = 'The worker running this job exited before it finished'
+            self._finish_locked(current, Job.FAILED)
+        else:
+            self._enqueue_locked(current)
+        return current
+
+    def _prune_due(self):
+        return time.time() - self._last_prune > self.prune_interval
+
+    def _scan_locked(self):
+        """
+        Count the queued jobs of all workers in one pass over jobs_dir,
+        removing expired jobs and adopting orphaned ones if a prune is due.
+        """
+        now = time.time()
+        prune = self._prune_due()
+        if prune:
+            self._last_prune = now
+
+        pending = 0
+        for entry in os.scandir(self.jobs_dir):
+            if not entry.is_dir():
+                continue
+
+            # Jobs owned by this worker are current in memory
+            job = self._jobs.get(entry.name)
+            if job is None:
+                job = self._load(entry.name)
+                if job is None:
+                    # Created but never submitted, e.g. the upload failed; give it time to finish
+                    if prune:
+                        try:
+                            expired = now - entry.stat().st_mtime > self.retention_seconds
+                        except OSError:
+                            continue
+                        if expired:
+                            shutil.rmtree(entry.path, ignore_errors=True)
+                    continue
+
+                if prune:
+                    if job.finished:
+                        if now - job.finished_at > self.retention_seconds:
+                            self._remove_work_dir(job)
+                        continue
+                    job = self._adopt_if_orphaned_locked(job)
+
+            if job.status == Job.QUEUED:
+                pending += 1
+        return pending
+
+    def _load(self, job_id):
+        # Job ids come from URLs; anything but a uuid4 hex is not a job directory
+        if len(job_id) != 32 or any(c not in '0123456789abcdef' for c in job_id):
+            return None
+
+        work_dir = os.path.join(self.jobs_dir, job_id)
+        try:
+            with open(os.path.join(work_dir, STATE_FILE), 'r', encoding='utf-8') as f:
+                return Job.from_state(json.load(f), work_dir)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _load_states(self):
+        states = []
+        for entry in os.scandir(self.jobs_dir):
+            try:
+                with open(os.path.join(entry.path, STATE_FILE), 'r', encoding='utf-8') as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return states
+
+    def _save(self, job):
+        self._write_atomic(job, STATE_FILE, json.dumps(job.to_state()))
+
+    def _write_result(self, job, result):
+        self._write_atomic(job, RESULT_FILE, self.dumps(result))
+        job.has_result = True
+
+    @staticmethod
+    def _write_atomic(job, filename, payload):
+        # Other workers read these files at any time, so never expose a partial write
+        fd, temp_path = tempfile.mkstemp(dir=job.work_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(temp_path, os.path.join(job.work_dir, filename))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _claim(self, job):
+        """Take the job's lock, held for as long as this process owns the job"""
+        fd = os.open(os.path.join(job.work_dir, LOCK_FILE), os.O_RDWR | os.O_CREAT)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+        self._held_locks[job.id] = fd
+        return True
+
+    def _release(self, job):
+        fd = self._held_locks.pop(job.id, None)
+        if fd is not None:
+            os.close(fd)
+
+    @staticmethod
+    def _clear_work_dir(job):
+        # Keep the state (and lock) so the outcome can still be polled
+        for entry in os.scandir(job.work_dir):
+            if entry.name in (STATE_FILE, LOCK_FILE):
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _remove_work_dir(self, job):
+        self._release(job)
+        shutil.rmtree(job.work_dir, ignore_errors=True)
\ No newline at end of file
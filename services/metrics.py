@@ -0,0 +1,347 @@
+"""
+Lightweight metrics with Prometheus text exposition, summed across worker processes
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows, where the development server is the only process
+    fcntl = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels:
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _series_key(labels):
+    # Label pairs come back from JSON snapshots as lists
+    return tuple(tuple(pair) for pair in labels)
+
+
+class Counter:
+    """Monotonically increasing value, one series per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, description, on_update=None):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._on_update = on_update
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Add amount to the series identified by labels"""
+        key = tuple(sorted((name, str(value)) for name, value in labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        if self._on_update is not None:
+            self._on_update()
+
+    def snapshot(self):
+        """Return the values as JSON-serializable data, for other processes to add up"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, total, snapshot):
+        """Add a snapshot to total, a dict of series key to value"""
+        for labels, value in snapshot:
+            key = _series_key(labels)
+            total[key] = total.get(key, 0) + value
+
+    def collect(self, snapshots=()):
+        """Render this process's values plus those of the given snapshots"""
+        with self._lock:
+            values = dict(self._values)
+        for snapshot in snapshots:
+            self.merge(values, snapshot)
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Histogram:
+    """Bucketed distribution of observations, one series per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS, on_update=None):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._on_update = on_update
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Record one observation in the series identified by labels"""
+        key = tuple(sorted((name, str(value)) for name, value in labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+        if self._on_update is not None:
+            self._on_update()
+
+    def snapshot(self):
+        """Return the series as JSON-serializable data, for other processes to add up"""
+        with self._lock:
+            series = [[list(key), list(entry['counts']), entry['sum'], entry['count']]
+                      for key, entry in self._series.items()]
+        return {'buckets': list(self.buckets), 'series': series}
+
+    def merge(self, total, snapshot):
+        """Add a snapshot to total, a dict of series key to (counts, sum, count)"""
+        # Series recorded with other buckets, by an older release, cannot be added up
+        if tuple(snapshot['buckets']) != self.buckets:
+            return
+        for labels, counts, series_sum, count in snapshot['series']:
+            key = _series_key(labels)
+            current = total.get(key)
+            if current is None:
+                total[key] = (list(counts), series_sum, count)
+            else:
+                total[key] = ([a + b for a, b in zip(current[0], counts)],
+                              current[1] + series_sum, current[2] + count)
+
+    def collect(self, snapshots=()):
+        """Render this process's series plus those of the given snapshots"""
+        series = {}
+        self.merge(series, self.snapshot())
+        for snapshot in snapshots:
+            self.merge(series, snapshot)
+
+        lines = []
+        for key, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = key + (('le', _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of one process and renders them for scraping.
+
+    With snapshot_dir, every process using the directory writes its values
+    there at most flush_interval seconds after they change (and when it
+    exits), and render() adds up the values of all of them. A scrape
+    answered by any gunicorn worker then covers the whole server, at most
+    flush_interval seconds behind. Snapshots of processes that have exited
+    are folded into one archive, so counters keep counting across worker
+    restarts. Processes are told apart by pid, so the directory must be
+    local to the host; scrape each host on its own.
+    """
+
+    ARCHIVE_FILE = 'archive.json'
+    LOCK_FILE = 'metrics.lock'
+
+    def __init__(self, snapshot_dir=None, flush_interval=5):
+        self._metrics = []
+        self.snapshot_dir = snapshot_dir
+        self.flush_interval = flush_interval
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+        self._flusher_pid = None
+        self._snapshot_name = None
+        self._changed = threading.Event()
+        self._lock = threading.Lock()
+
+    def counter(self, name, description):
+        """Create and register a counter"""
+        metric = Counter(name, description, on_update=self._on_update)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, description, buckets=DEFAULT_BUCKETS):
+        """Create and register a histogram"""
+        metric = Histogram(name, description, buckets, on_update=self._on_update)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        snapshots = self._read_snapshots()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect([snapshot[metric.name] for snapshot in snapshots
+                                         if metric.name in snapshot]))
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """Write this process's values to snapshot_dir now"""
+        if self._flusher_pid != os.getpid():
+            return
+        snapshot = {metric.name: metric.snapshot() for metric in self._metrics}
+        self._write_json(os.path.join(self.snapshot_dir, self._snapshot_name), snapshot)
+
+    def _on_update(self):
+        if not self.snapshot_dir:
+            return
+        # Threads do not survive a fork, so every worker starts its own flusher
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+        self._changed.set()
+
+    def _start_flusher(self):
+        with self._lock:
+            pid = os.getpid()
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            self._snapshot_name = f"{pid}-{uuid.uuid4().hex}.json"
+            self._changed = threading.Event()
+        threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True).start()
+        atexit.register(self._flush_at_exit)
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def _flush_loop(self):
+        while True:
+            self._changed.wait()
+            time.sleep(self.flush_interval)
+            self._changed.clear()
+            try:
+                self.flush()
+                self._fold_exited()
+            except OSError:
+                # Metrics must never take the worker down; retry on the next change
+                self._changed.set()
+
+    def _fold_exited(self):
+        """Add the snapshots of exited processes to the archive and remove them"""
+        if fcntl is None:
+            # Without flock there are no other processes to fold, and os.kill cannot probe pids
+            return
+        with self._dir_lock(exclusive=True):
+            exited = []
+            for name in os.listdir(self.snapshot_dir):
+                pid, _, rest = name.partition('-')
+                if rest.endswith('.json') and pid.isdigit() and not _process_alive(int(pid)):
+                    exited.append(os.path.join(self.snapshot_dir, name))
+            if not exited:
+                return
+
+            archive_path = os.path.join(self.snapshot_dir, self.ARCHIVE_FILE)
+            totals = {}
+            for path in [archive_path] + exited:
+                snapshot = self._read_json(path)
+                for metric in self._metrics:
+                    if metric.name in snapshot:
+                        metric.merge(totals.setdefault(metric.name, {}), snapshot[metric.name])
+
+            archive = {}
+            for metric in self._metrics:
+                series = totals.get(metric.name, {})
+                if metric.kind == 'counter':
+                    archive[metric.name] = [[list(key), value] for key, value in series.items()]
+                else:
+                    archive[metric.name] = {
+                        'buckets': list(metric.buckets),
+                        'series': [[list(key), counts, total, count]
+                                   for key, (counts, total, count) in series.items()]
+                    }
+            self._write_json(archive_path, archive)
+            for path in exited:
+                os.remove(path)
+
+    def _read_snapshots(self):
+        """Return the snapshots of every other process, and the archive"""
+        if not self.snapshot_dir:
+            return []
+        own = self._snapshot_name if self._flusher_pid == os.getpid() else None
+        with self._dir_lock(exclusive=False):
+            return [self._read_json(os.path.join(self.snapshot_dir, name))
+                    for name in os.listdir(self.snapshot_dir)
+                    if name.endswith('.json') and name != own]
+
+    def _dir_lock(self, exclusive):
+        return _FileLock(os.path.join(self.snapshot_dir, self.LOCK_FILE), exclusive)
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_json(self, path, payload):
+        # Other processes read the snapshots at any time, so never expose a partial write
+        fd, temp_path = tempfile.mkstemp(dir=self.snapshot_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, separators=(',', ':'))
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+class _FileLock:
+    """flock on a file: shared while snapshots are read, exclusive while they are folded"""
+
+    def __init__(self, path, exclusive):
+        self.path = path
+        self.exclusive = exclusive
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc_info):
+        os.close(self._fd)
+        return False
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
\ No newline at end of file
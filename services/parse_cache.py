@@ -0,0 +1,108 @@
+"""
+Persistent caches of results derived from uploaded documents
+"""
+import hashlib
+import importlib.util
+import os
+import pickle
+import tempfile
+
+from services.uploads import hash_document
+
+
+def module_version(module_name):
+    """
+    Return a short hash of a module's source file.
+
+    Used as a cache version, so results produced by older code stop
+    matching as soon as the module that produces them is edited.
+    """
+    origin = importlib.util.find_spec(module_name).origin
+    with open(origin, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+class DocumentResultCache:
+    """
+    Stores results computed from a document on disk, e.g. SopParser
+    factors or rate card analytics, keyed by the document's content hash
+    and the version of the code that produced them.
+
+    Results are pickled, so a hit returns the same types the miss path
+    produced (tuples, non-string keys, NumPy values, sets); the directory
+    must only be writable by the application.
+
+    A new version invalidates every entry written by older code. Each hit
+    refreshes the entry's modification time, and once more than max_entries
+    are stored the least recently used ones are removed.
+    """
+
+    def __init__(self, cache_dir, version='1', max_entries=512):
+        self.cache_dir = cache_dir
+        self.version = str(version)
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key_for_stream(self, stream, filename):
+        """Build the cache key for a document read from a seekable stream"""
+        return f"{hash_document(stream, filename)}-v{self.version}"
+
+    def get(self, key):
+        """Return the cached result for key, or None on a miss"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+        # Mark as recently used for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """Store a result for key; results that cannot be pickled are skipped"""
+        try:
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+
+        # Write to a temporary file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, self._entry_path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        self._evict()
+        return True
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pickle")
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pickle'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Portfolio cross-checking of many vendors' SOP / rate card / settlement triples
+"""
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from services.uploads import hash_file
+
+FILE_ROLES = ('sop', 'rate_card', 'settlement')
+
+
+def load_manifest(path):
+    """
+    Load vendor triples from a manifest.
+
+    A CSV manifest has the columns vendor, sop, rate_card, settlement; a
+    JSON manifest is a list of objects with the same keys. Relative file
+    paths are resolved against the manifest's directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+    else:
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+
+    triples = []
+    for index, row in enumerate(rows):
+        missing = [role for role in FILE_ROLES if not row.get(role)]
+        if missing:
+            raise ValueError(f"Manifest row {index + 1} is missing: {', '.join(missing)}")
+
+        triple = {'vendor': row.get('vendor') or f"vendor_{index + 1}"}
+        for role in FILE_ROLES:
+            triple[role] = os.path.join(base_dir, row[role])
+        triples.append(triple)
+    return triples
+
+
+def discover_triples(directory):
+    """
+    Find vendor triples in a directory with one sub-directory per vendor,
+    each holding files whose names start with sop, rate_card and settlement.
+    """
+    triples = []
+    for vendor in sorted(os.listdir(directory)):
+        vendor_dir = os.path.join(directory, vendor)
+        if not os.path.isdir(vendor_dir):
+            continue
+
+        triple = {'vendor': vendor}
+        for filename in sorted(os.listdir(vendor_dir)):
+            for role in FILE_ROLES:
+                if role not in triple and filename.lower().startswith(role):
+                    triple[role] = os.path.join(vendor_dir, filename)
+
+        missing = [role for role in FILE_ROLES if role not in triple]
+        if missing:
+            raise ValueError(f"Vendor directory {vendor_dir} is missing: {', '.join(missing)}")
+        triples.append(triple)
+    return triples
+
+
+def _cross_check_triple(sop_path, rate_card_path, settlement_path):
+    """Run cross_check_all for one triple; runs inside a portfolio worker process"""
+    from services.cross_checker import CrossChecker
+    cross_checker = CrossChecker()
+    return cross_checker.cross_check_all(sop_path, rate_card_path, settlement_path)
+
+
+class PortfolioCrossChecker:
+    """
+    Cross-checks many vendors in parallel and consolidates the results.
+
+    Triples whose three files have identical content, e.g. vendors that
+    share an SOP and rate card and re-submitted the same settlement, are
+    only cross-checked once.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def run(self, triples):
+        """Cross-check every triple and return per-vendor results plus a consolidated summary"""
+        file_hashes = {}
+        unique_jobs = {}
+        vendor_keys = []
+        for triple in triples:
+            key = tuple(self._hash_file(triple[role], file_hashes) for role in FILE_ROLES)
+            unique_jobs.setdefault(key, tuple(triple[role] for role in FILE_ROLES))
+            vendor_keys.append((triple['vendor'], key))
+
+        outcomes = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {key: pool.submit(_cross_check_triple, *paths) for key, paths in unique_jobs.items()}
+            for key, future in futures.items():
+                try:
+                    outcomes[key] = {'success': True, 'cross_check_result': future.result()}
+                except Exception as e:
+                    outcomes[key] = {'success': False, 'error': str(e)}
+
+        vendors = [{'vendor': vendor, **outcomes[key]} for vendor, key in vendor_keys]
+        return {
+            'summary': self.summarize(vendors, unique_runs=len(unique_jobs)),
+            'vendors': vendors
+        }
+
+    @staticmethod
+    def summarize(vendors, unique_runs=None):
+        """Consolidate per-vendor cross-check results into one portfolio summary"""
+        succeeded = [vendor for vendor in vendors if vendor['success']]
+        expected_total = 0.0
+        actual_total = 0.0
+        variance_total = 0.0
+        weighted_accuracy = 0.0
+        accuracy_weight = 0.0
+        consistency_issues = 0
+        severity_counts = {}
+        variances = []
+
+        # Variance and accuracy are taken from each vendor's own result rather than
+        # re-derived, so the portfolio uses cross_check_all's definitions of both
+        for vendor in succeeded:
+            result = vendor['cross_check_result']
+            payment = result.get('payment_accuracy', {})
+            expected = payment.get('expected_payment', 0) or 0
+            expected_total += expected
+            actual_total += payment.get('actual_payment', 0) or 0
+            variance = payment.get('variance', 0) or 0
+            variance_total += variance
+            variances.append((vendor['vendor'], variance))
+
+            # Accuracy is weighted by expected payment, so large vendors count for more
+            accuracy = payment.get('accuracy_percentage')
+            if accuracy is not None and expected:
+                weighted_accuracy += accuracy * expected
+                accuracy_weight += expected
+
+            consistency_issues += len(result.get('consistency_checks', []))
+            severity = result.get('risk_assessment', {}).get('severity', 'unknown')
+            severity_counts[severity] = severity_counts.get(severity, 0) + 1
+
+        variances.sort(key=lambda item: abs(item[1]), reverse=True)
+        return {
+            'total_vendors': len(vendors),
+            'succeeded': len(succeeded),
+            'failed': len(vendors) - len(succeeded),
+            'unique_cross_checks': unique_runs if unique_runs is not None else len(vendors),
+            'expected_payment': expected_total,
+            'actual_payment': actual_total,
+            'variance': variance_total,
+            'accuracy_percentage': weighted_accuracy / accuracy_weight if accuracy_weight else None,
+            'consistency_issues': consistency_issues,
+            'risk_severity_counts': severity_counts,
+            'largest_variances': [
+                {'vendor': vendor, 'variance': variance} for vendor, variance in variances[:10]
+            ],
+            'failed_vendors': [
+                {'vendor': vendor['vendor'], 'error': vendor['error']}
+                for vendor in vendors if not vendor['success']
+            ]
+        }
+
+    @staticmethod
+    def _hash_file(path, cache):
+        # Shared SOPs and rate cards appear in many triples; hash each path once
+        path = os.path.abspath(path)
+        if path not in cache:
+            cache[path] = hash_file(path)
+        return cache[path]
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Content-addressed cache for cross-check results
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from services.uploads import hash_document
+
+
+class CrossCheckCache:
+    """
+    Keeps recent cross_check_all results keyed by the content of the
+    SOP, rate card and settlement files that produced them.
+
+    Entries are evicted least-recently-used once max_entries or max_bytes
+    is reached, and expire ttl_seconds after they were stored. An entry's
+    size is the length of its pickled form, which understates the memory
+    the live objects take, so max_bytes is a budget rather than a limit.
+    A result larger than the whole budget is not kept.
+
+    With cache_dir, every result is also written there, so the worker
+    processes sharing that directory can serve each other's result ids.
+    Results are pickled rather than stored as JSON so the report writers
+    get back exactly the types cross_check_all produced; the directory must
+    only be writable by the application. Results missing from memory are
+    read back from it, and the oldest files are removed beyond max_entries
+    or max_disk_bytes.
+    """
+
+    def __init__(self, max_entries=32, ttl_seconds=3600, cache_dir=None, max_bytes=None, max_disk_bytes=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, sop_file, rate_card_file, settlement_file):
+        """Build the cache key for an SOP / rate card / settlement upload set"""
+        digest = hashlib.sha256()
+        for file_storage in (sop_file, rate_card_file, settlement_file):
+            digest.update(hash_document(file_storage.stream, file_storage.filename).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached result for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, _, result = entry
+                if time.time() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    return result
+                self._forget_locked(key)
+
+        # Possibly stored by another worker process
+        entry = self._read(key)
+        if entry is None:
+            return None
+        self._remember(key, *entry)
+        return entry[2]
+
+    def put(self, key, result):
+        """Store a result, evicting the least recently used entries if full"""
+        try:
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Without a pickled form it can be neither sized nor shared
+            return
+
+        self._remember(key, time.time(), len(payload), result)
+        self._write(key, payload)
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.cache_dir:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.pickle'):
+                    self._remove(entry.path)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _remember(self, key, stored_at, size, result):
+        with self._lock:
+            self._forget_locked(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self._entries[key] = (stored_at, size, result)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def _forget_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _entry_path(self, key):
+        # Keys also arrive as result ids in URLs; only hex digests name a file
+        if not self.cache_dir or not key or any(c not in '0123456789abcdef' for c in key):
+            return None
+        return os.path.join(self.cache_dir, f"{key}.pickle")
+
+    def _read(self, key):
+        path = self._entry_path(key)
+        if path is None:
+            return None
+        try:
+            stored_at = os.path.getmtime(path)
+            if time.time() - stored_at > self.ttl_seconds:
+                self._remove(path)
+                return None
+            with open(path, 'rb') as f:
+                payload = f.read()
+            return stored_at, len(payload), pickle.loads(payload)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+    def _write(self, key, payload):
+        path = self._entry_path(key)
+        if path is None or (self.max_disk_bytes is not None and len(payload) > self.max_disk_bytes):
+            return
+
+        # Write to a temporary file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError:
+            self._remove(temp_path)
+            return
+        self._evict_files()
+
+    def _evict_files(self):
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.pickle'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                self._remove(entry.path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # Oldest first, until both the count and the byte budget are met
+        entries.sort()
+        count = len(entries)
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and (self.max_disk_bytes is None or total <= self.max_disk_bytes):
+                break
+            self._remove(path)
+            count -= 1
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Summary, field-filtered and paginated views of cross-check results
+"""
+import json
+
+try:
+    # Flask 2.2 and later
+    from flask.json.provider import DefaultJSONProvider
+    _flask_default = DefaultJSONProvider.default
+except ImportError:
+    from flask.json import JSONEncoder
+    _flask_default = JSONEncoder().default
+
+# Per-tour / per-finding lists that grow with the settlement size
+LIST_SECTIONS = (
+    ('consistency_checks',),
+    ('risk_assessment', 'risk_factors'),
+    ('recommendations',),
+    ('insights',),
+)
+
+
+def _get_path(result, path):
+    value = result
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _replace_path(result, path, value):
+    """Return a copy of result with the value at path replaced; the input is not modified"""
+    updated = dict(result)
+    if len(path) == 1:
+        updated[path[0]] = value
+    else:
+        updated[path[0]] = _replace_path(result.get(path[0]) or {}, path[1:], value)
+    return updated
+
+
+def section_totals(result):
+    """Return the length of every list section present in the result"""
+    totals = {}
+    for path in LIST_SECTIONS:
+        items = _get_path(result, path)
+        if isinstance(items, list):
+            totals['.'.join(path)] = len(items)
+    return totals
+
+
+def summarize(result):
+    """Return the result with every list section replaced by its length"""
+    summary = result
+    for path in LIST_SECTIONS:
+        items = _get_path(summary, path)
+        if isinstance(items, list):
+            summary = _replace_path(summary, path, len(items))
+    return summary
+
+
+def select_fields(result, fields):
+    """Keep only the given top-level sections of the result"""
+    return {field: result[field] for field in fields if field in result}
+
+
+def paginate(result, page, page_size):
+    """Return one page (1-based) of every list section in the result"""
+    start = (page - 1) * page_size
+    paged = result
+    for path in LIST_SECTIONS:
+        items = _get_path(paged, path)
+        if isinstance(items, list):
+            paged = _replace_path(paged, path, items[start:start + page_size])
+    return paged
+
+
+def _json_default(value):
+    # pandas/NumPy scalars and arrays end up in results built from DataFrames
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    # Dates, decimals, UUIDs and dataclasses serialize as they do through jsonify
+    return _flask_default(value)
+
+
+def dumps(payload):
+    """Serialize a payload compactly, without key sorting or indentation"""
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=_json_default)
\ No newline at end of file
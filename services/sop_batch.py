@@ -0,0 +1,53 @@
+"""
+Parallel SOP parsing for batch uploads
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def parse_sop(filepath):
+    """Parse one SOP file; runs inside a batch worker process"""
+    from services.sop_parser import SopParser
+    return SopParser().parse(filepath)
+
+
+class SopBatchParser:
+    """
+    Parses SOP files on a process pool shared by the requests of one worker.
+
+    The pool is started on first use with forkserver (spawn where that is
+    not available), so its processes are never forked from a web worker
+    that already runs request threads or has TensorFlow loaded. Only file
+    paths go to the children and only the extracted factors come back. If
+    a child dies, the broken pool is replaced on the next submission.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, filepath):
+        """Start parsing filepath and return a future for its factors"""
+        executor = self._get_executor()
+        try:
+            return executor.submit(parse_sop, filepath)
+        except BrokenProcessPool:
+            self._discard(executor)
+            return self._get_executor().submit(parse_sop, filepath)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._executor
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
\ No newline at end of file
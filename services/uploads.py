@@ -0,0 +1,69 @@
+"""
+Per-request workspaces for uploaded files
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from werkzeug.utils import secure_filename
+
+# Uploads go under the system temp directory unless UPLOAD_TEMP_DIR points elsewhere
+UPLOAD_TEMP_DIR = os.environ.get('UPLOAD_TEMP_DIR') or None
+
+
+def create_workspace(prefix='upload_'):
+    """Create a private temporary directory for one request's or job's files"""
+    return tempfile.mkdtemp(prefix=prefix, dir=UPLOAD_TEMP_DIR)
+
+
+@contextmanager
+def upload_workspace(prefix='upload_'):
+    """Yield a private temporary directory and remove it, with its contents, afterwards"""
+    directory = create_workspace(prefix)
+    try:
+        yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def save_upload(file_storage, directory, prefix=''):
+    """
+    Save an upload into directory under a sanitized name and return its path.
+
+    The original extension is always kept, because the parsers choose how to
+    read a file from it.
+    """
+    extension = os.path.splitext(file_storage.filename or '')[1].lower()
+    filename = secure_filename(file_storage.filename or '')
+    if not filename or not filename.lower().endswith(extension):
+        filename = f"upload{extension}"
+
+    path = os.path.join(directory, f"{prefix}{filename}")
+    file_storage.save(path)
+    return path
+
+
+def hash_document(stream, filename, chunk_size=1024 * 1024):
+    """
+    Return the identity of a document as '<sha256>-<extension>'.
+
+    The stream is read from the start and rewound afterwards, so an upload
+    can still be saved once it has been hashed. The parsers dispatch on
+    extension, so it is part of the identity.
+    """
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return f"{digest.hexdigest()}-{extension}"
+
+
+def hash_file(path):
+    """Return the identity of a document on disk, as hash_document does for streams"""
+    with open(path, 'rb') as f:
+        return hash_document(f, path)
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Streaming zip archive writer for sending several report files in one response
+"""
+import zipfile
+
+
+class _ChunkBuffer:
+    """Write-only sink that hands written bytes back to the generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(members, chunk_size=256 * 1024):
+    """
+    Yield a zip archive of members, a list of (archive name, file path)
+    pairs, as it is built.
+
+    Nothing is staged on disk and only about one chunk is held in memory
+    at a time. Members are stored uncompressed because the reports are
+    already compressed xlsx files.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as zipf:
+        for arcname, path in members:
+            with open(path, 'rb') as src, zipf.open(arcname, 'w') as dest:
+                for chunk in iter(lambda: src.read(chunk_size), b''):
+                    dest.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+
+    # Central directory, written when the archive is closed
+    data = buffer.drain()
+    if data:
+        yield data
\ No newline at end of file
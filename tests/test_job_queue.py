@@ -0,0 +1,108 @@
+"""
+Tests for JobQueue state shared between worker processes
+"""
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+
+from services.job_queue import Job, JobQueue, fcntl
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Another web worker: submits one slow job, prints its id and keeps running it
+OWNER_SCRIPT = textwrap.dedent("""
+    import sys, time
+    from services.job_queue import JobQueue
+
+    def runner(job):
+        for _ in range(job.params['steps']):
+            time.sleep(0.1)
+            job.check_cancelled()
+        return {'owner': True}
+
+    queue = JobQueue(runner, sys.argv[1], max_workers=1)
+    job = queue.create('cross_check', {'steps': int(sys.argv[2])})
+    queue.submit(job)
+    print(job.id, flush=True)
+    time.sleep(60)
+""")
+
+
+def wait_for(queue, job_id, statuses, timeout=10):
+    deadline = time.time() + timeout
+    job = queue.get(job_id)
+    while job.status not in statuses and time.time() < deadline:
+        time.sleep(0.05)
+        job = queue.get(job_id)
+    return job
+
+
+@unittest.skipIf(fcntl is None, 'job ownership needs flock')
+class JobQueueSharedStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs_dir = tempfile.mkdtemp(prefix='jobs_')
+        self.queue = JobQueue(lambda job: {'adopted': True}, self.jobs_dir, max_workers=1, prune_interval=0)
+        self.owner = None
+
+    def tearDown(self):
+        if self.owner is not None and self.owner.poll() is None:
+            self.owner.kill()
+            self.owner.wait()
+            self.owner.stdout.close()
+
+    def start_owner(self, steps=100):
+        self.owner = subprocess.Popen([sys.executable, '-c', OWNER_SCRIPT, self.jobs_dir, str(steps)],
+                                      cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+        job_id = self.owner.stdout.readline().strip()
+        self.assertEqual(len(job_id), 32)
+        return job_id
+
+    def test_status_from_other_worker(self):
+        job_id = self.start_owner()
+
+        job = wait_for(self.queue, job_id, (Job.RUNNING,))
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        # Still owned by the other worker, not adopted
+        self.assertNotIn(job_id, self.queue._jobs)
+
+    def test_cancel_from_other_worker(self):
+        job_id = self.start_owner()
+        wait_for(self.queue, job_id, (Job.RUNNING,))
+
+        self.queue.cancel(job_id)
+
+        job = wait_for(self.queue, job_id, (Job.CANCELLED,))
+        self.assertEqual(job.status, Job.CANCELLED)
+        self.assertIsNone(job.result_path)
+        self.assertNotIn(job_id, self.queue._jobs)
+
+    def test_adopts_job_after_owner_exits(self):
+        job_id = self.start_owner()
+        wait_for(self.queue, job_id, (Job.RUNNING,))
+
+        self.owner.send_signal(signal.SIGKILL)
+        self.owner.wait()
+
+        job = wait_for(self.queue, job_id, (Job.COMPLETED, Job.FAILED))
+        self.assertEqual(job.status, Job.COMPLETED)
+        self.assertEqual(job.attempts, 2)
+        with open(job.result_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), '{"adopted": true}')
+
+    def test_result_paths_are_absolute(self):
+        job = self.queue.create('cross_check')
+        self.queue.submit(job)
+
+        job = wait_for(self.queue, job.id, (Job.COMPLETED,))
+        self.assertTrue(os.path.isabs(job.result_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
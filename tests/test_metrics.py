@@ -0,0 +1,86 @@
+"""
+Tests for metrics added up across worker processes
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from services.metrics import MetricsRegistry, fcntl
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Another web worker: records requests and exits, flushing its values on the way out
+WORKER_SCRIPT = textwrap.dedent("""
+    import sys
+    from services.metrics import MetricsRegistry
+
+    metrics = MetricsRegistry(snapshot_dir=sys.argv[1], flush_interval=60)
+    requests = metrics.counter('requests_total', 'Requests')
+    latency = metrics.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for _ in range(int(sys.argv[2])):
+        requests.inc(endpoint='cross_check', status=200)
+        latency.observe(0.5, endpoint='cross_check')
+""")
+
+
+def build_registry(snapshot_dir):
+    metrics = MetricsRegistry(snapshot_dir=snapshot_dir, flush_interval=60)
+    requests = metrics.counter('requests_total', 'Requests')
+    latency = metrics.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    return metrics, requests, latency
+
+
+@unittest.skipIf(fcntl is None, 'exited workers are only detected with flock')
+class MetricsAcrossWorkersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp(prefix='metrics_')
+
+    def tearDown(self):
+        shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+
+    def run_worker(self, requests):
+        subprocess.run([sys.executable, '-c', WORKER_SCRIPT, self.snapshot_dir, str(requests)],
+                       cwd=REPO_ROOT, check=True)
+
+    def test_render_adds_up_every_worker(self):
+        metrics, requests, latency = build_registry(self.snapshot_dir)
+        requests.inc(endpoint='cross_check', status=200)
+        latency.observe(0.05, endpoint='cross_check')
+
+        self.run_worker(3)
+        self.run_worker(2)
+
+        rendered = metrics.render()
+        self.assertIn('requests_total{endpoint="cross_check",status="200"} 6', rendered)
+        self.assertIn('latency_seconds_bucket{endpoint="cross_check",le="0.1"} 1', rendered)
+        self.assertIn('latency_seconds_bucket{endpoint="cross_check",le="1"} 6', rendered)
+        self.assertIn('latency_seconds_count{endpoint="cross_check"} 6', rendered)
+
+    def test_exited_workers_are_folded_into_the_archive(self):
+        metrics, requests, _ = build_registry(self.snapshot_dir)
+        self.run_worker(3)
+        self.run_worker(2)
+
+        requests.inc(endpoint='cross_check', status=200)
+        metrics._fold_exited()
+
+        snapshots = sorted(name for name in os.listdir(self.snapshot_dir) if name.endswith('.json'))
+        self.assertEqual(snapshots, [MetricsRegistry.ARCHIVE_FILE])
+        self.assertIn('requests_total{endpoint="cross_check",status="200"} 6', metrics.render())
+
+    def test_without_snapshot_dir_only_this_process_is_reported(self):
+        metrics = MetricsRegistry()
+        requests = metrics.counter('requests_total', 'Requests')
+        requests.inc(2, endpoint='upload_sop', status=200)
+
+        self.assertIn('requests_total{endpoint="upload_sop",status="200"} 2', metrics.render())
+        self.assertEqual(os.listdir(self.snapshot_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
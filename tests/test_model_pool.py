@@ -0,0 +1,54 @@
+"""
+Tests for ModelPool borrowing and load failures
+"""
+import threading
+import time
+import unittest
+
+from models.model_pool import ModelPool
+
+
+class ModelPoolTest(unittest.TestCase):
+
+    def test_waiter_retries_after_failed_load(self):
+        loads = []
+
+        def factory():
+            loads.append(None)
+            time.sleep(0.1)
+            if len(loads) == 1:
+                raise RuntimeError('model files missing')
+            return object()
+
+        pool = ModelPool(size=1, factory=factory)
+        outcomes = []
+
+        def predict():
+            try:
+                with pool.model():
+                    outcomes.append('ok')
+            except RuntimeError:
+                outcomes.append('failed')
+
+        threads = [threading.Thread(target=predict) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(sorted(outcomes), ['failed', 'ok', 'ok'])
+        self.assertEqual(len(loads), 2)
+
+    def test_warm_loads_every_model_once(self):
+        pool = ModelPool(size=2, factory=object)
+        pool.warm()
+        pool.warm()
+
+        with pool.model() as first, pool.model() as second:
+            self.assertIsNot(first, second)
+        self.assertEqual(pool._created, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""
+Tests for DocumentResultCache
+"""
+import io
+import shutil
+import tempfile
+import unittest
+
+from services.parse_cache import DocumentResultCache
+
+
+class DocumentResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='parse_cache_')
+        self.cache = DocumentResultCache(self.cache_dir, version='abc', max_entries=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_hit_returns_the_stored_types(self):
+        sop_data = {
+            'rate_bands': [(0, 50, 12.5), (50, 100, 11.0)],
+            'penalties': {1: 0.02, 2: 0.05},
+            'vehicle_types': {'22FT', '32FT'},
+        }
+        key = self.cache.key_for_stream(io.BytesIO(b'sop text'), 'sop.pdf')
+
+        self.assertTrue(self.cache.put(key, sop_data))
+        self.assertEqual(self.cache.get(key), sop_data)
+
+    def test_rate_card_analysis_hit_matches_fresh_analysis(self):
+        analysis = {
+            'vehicle_distribution': {'22FT': 14, '32FT': 6},
+            'rate_analysis': {'22FT': {'min': 38.0, 'max': 42.5, 'lanes': ('BLR-MAA', 'BLR-HYD')}},
+            'recommendations': ['Renegotiate 32FT rates on BLR-MAA'],
+        }
+        key = self.cache.key_for_stream(io.BytesIO(b'rate card'), 'rate_card.xlsx')
+
+        self.cache.put(key, analysis)
+        self.assertEqual(self.cache.get(key), analysis)
+        self.assertIsInstance(self.cache.get(key)['rate_analysis']['22FT']['lanes'], tuple)
+
+    def test_key_depends_on_content_and_version(self):
+        key = self.cache.key_for_stream(io.BytesIO(b'sop text'), 'sop.pdf')
+        other_content = self.cache.key_for_stream(io.BytesIO(b'amended sop'), 'sop.pdf')
+        other_version = DocumentResultCache(self.cache_dir, version='def').key_for_stream(
+            io.BytesIO(b'sop text'), 'sop.pdf')
+
+        self.assertEqual(len({key, other_content, other_version}), 3)
+
+    def test_unpicklable_result_is_skipped(self):
+        self.assertFalse(self.cache.put('key', {'parse': lambda: None}))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_evicts_beyond_max_entries(self):
+        for index in range(3):
+            self.cache.put(f'key{index}', index)
+
+        self.assertEqual(sum(self.cache.get(f'key{index}') is not None for index in range(3)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
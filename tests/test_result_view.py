@@ -0,0 +1,30 @@
+"""
+Tests for the JSON serialization of cross-check results
+"""
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from services import result_view
+
+
+class DumpsTest(unittest.TestCase):
+
+    def test_values_serialize_as_through_jsonify(self):
+        payload = {
+            'generated_at': datetime(2026, 10, 15, tzinfo=timezone.utc),
+            'result_id': uuid.UUID('12345678123456781234567812345678'),
+        }
+
+        self.assertEqual(
+            result_view.dumps(payload),
+            '{"generated_at":"Thu, 15 Oct 2026 00:00:00 GMT","result_id":"12345678-1234-5678-1234-567812345678"}'
+        )
+
+    def test_unsupported_values_still_raise(self):
+        with self.assertRaises(TypeError):
+            result_view.dumps({'vendors': {'V0001'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,17 @@
+"""
+Production WSGI entry point for Middle Mile Support
+
+Run with gunicorn, which reads gunicorn.conf.py from the working directory:
+    gunicorn wsgi:app
+"""
+import gc
+
+from app import app
+
+# The ML models are not loaded here: TensorFlow starts thread pools when it
+# initializes and is not fork-safe, so each worker loads its own copy after
+# the fork (see post_worker_init in gunicorn.conf.py)
+
+# Move everything allocated so far out of the garbage collector's view, so
+# collections in the workers do not touch (and thereby copy) shared pages
+gc.freeze()
\ No newline at end of file